@@ -0,0 +1,411 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH_DEFECTO = os.path.join(BASE_DIR, 'data', 'odds_iabet.sqlite3')
+
+# Número de filas por executemany dentro de una misma transacción
+TAMANO_LOTE = 1000
+
+# Nombres de mercado estándar del prematch (mismas claves que procesar_odds)
+MERCADOS_PREMATCH = {
+    'h2h': 'moneyline',
+    'spreads': 'spread',
+    'totals': 'total',
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS eventos (
+    event_id TEXT PRIMARY KEY,
+    home_team TEXT,
+    away_team TEXT,
+    commence_time TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_commence ON eventos (commence_time);
+
+CREATE TABLE IF NOT EXISTS cuotas (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT NOT NULL,
+    player_id TEXT,
+    player_name TEXT,
+    market TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    line REAL,
+    book TEXT NOT NULL,
+    price REAL NOT NULL,
+    captured_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cuotas_evento
+    ON cuotas (event_id, player_id, market, selection, line, captured_at);
+CREATE INDEX IF NOT EXISTS idx_cuotas_jugador
+    ON cuotas (player_id, market, selection, line, captured_at);
+CREATE INDEX IF NOT EXISTS idx_cuotas_snapshot ON cuotas (event_id, market, captured_at);
+CREATE INDEX IF NOT EXISTS idx_cuotas_book ON cuotas (book, captured_at);
+CREATE INDEX IF NOT EXISTS idx_cuotas_captured ON cuotas (captured_at);
+
+CREATE TABLE IF NOT EXISTS predicciones (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT NOT NULL,
+    game_id TEXT,
+    event_datetime TEXT,
+    player_id TEXT,
+    player_name TEXT,
+    team TEXT,
+    market TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    line REAL,
+    probability REAL NOT NULL,
+    confidence REAL,
+    stored_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predicciones_evento
+    ON predicciones (event_id, player_id, market, selection, line);
+
+CREATE TABLE IF NOT EXISTS recomendaciones (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT NOT NULL,
+    game_id TEXT,
+    commence_time TEXT,
+    player_id TEXT,
+    player_name TEXT,
+    team TEXT,
+    market TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    side TEXT,
+    line REAL,
+    odds REAL NOT NULL,
+    model_prob REAL NOT NULL,
+    implied_prob REAL,
+    value REAL NOT NULL,
+    confidence REAL,
+    recommendation TEXT,
+    generated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recomendaciones_evento ON recomendaciones (event_id, value);
+CREATE INDEX IF NOT EXISTS idx_recomendaciones_slate ON recomendaciones (commence_time, value);
+CREATE INDEX IF NOT EXISTS idx_recomendaciones_jugador
+    ON recomendaciones (player_id, market, selection, line);
+CREATE INDEX IF NOT EXISTS idx_recomendaciones_generated ON recomendaciones (generated_at);
+"""
+
+
+def normalizar_fecha(valor):
+    """Convierte una fecha (ISO o datetime) al formato UTC único del almacén.
+
+    Las fechas sin zona horaria se interpretan como UTC. El resultado tiene
+    ancho fijo (``YYYY-MM-DDTHH:MM:SS.ffffffZ``) para que las comparaciones
+    de texto en SQLite respeten el orden cronológico.
+    """
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor.strip().replace('Z', '+00:00'))
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def ahora_utc():
+    return normalizar_fecha(datetime.now(timezone.utc))
+
+
+def abrir_almacen(db_path=DB_PATH_DEFECTO):
+    """Abre (o crea) la base SQLite con el esquema e índices."""
+
+    if db_path != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(ESQUEMA)
+    return conn
+
+
+def _insertar_en_lotes(conn, sql, filas):
+    """Inserta las filas con executemany en lotes de TAMANO_LOTE."""
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        conn.executemany(sql, filas[inicio:inicio + TAMANO_LOTE])
+
+
+def _guardar_evento(conn, event_id, home_team=None, away_team=None, commence_time=None):
+    conn.execute(
+        """
+        INSERT INTO eventos (event_id, home_team, away_team, commence_time, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(event_id) DO UPDATE SET
+            home_team = COALESCE(excluded.home_team, home_team),
+            away_team = COALESCE(excluded.away_team, away_team),
+            commence_time = COALESCE(excluded.commence_time, commence_time),
+            updated_at = excluded.updated_at
+        """,
+        (event_id, home_team, away_team, normalizar_fecha(commence_time), ahora_utc()),
+    )
+
+
+SQL_INSERTAR_CUOTA = """
+    INSERT INTO cuotas (event_id, player_id, player_name, market, selection, line, book, price, captured_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def guardar_odds_prematch(conn, odds_data, captured_at=None):
+    """Guarda las odds prematch (formato de get_prematch_odds) en una transacción.
+
+    Moneyline y spread se guardan como ``home``/``away``, igual que los agrupa ``procesar_odds``.
+    """
+
+    captured_at = normalizar_fecha(captured_at) or ahora_utc()
+    eventos = odds_data if isinstance(odds_data, list) else [odds_data]
+    filas = []
+    with conn:
+        for evento in eventos:
+            event_id = evento.get('id')
+            home_team = evento.get('home_team')
+            _guardar_evento(conn, event_id, home_team, evento.get('away_team'), evento.get('commence_time'))
+            for bookmaker in evento.get('bookmakers', []):
+                for market in bookmaker.get('markets', []):
+                    mercado = MERCADOS_PREMATCH.get(market.get('key'))
+                    if not mercado:
+                        continue
+                    for outcome in market.get('outcomes', []):
+                        if mercado == 'total':
+                            seleccion = outcome['name'].lower()
+                        else:
+                            seleccion = 'home' if outcome['name'] == home_team else 'away'
+                        filas.append((
+                            event_id, None, None, mercado, seleccion, outcome.get('point'),
+                            bookmaker.get('title') or bookmaker.get('key'), outcome['price'], captured_at,
+                        ))
+        _insertar_en_lotes(conn, SQL_INSERTAR_CUOTA, filas)
+    return len(filas)
+
+
+def guardar_odds_player_props(conn, props_data, captured_at=None):
+    """Guarda los player props (formato de filtrar_player_props) en una transacción.
+
+    ``metadata.teams`` no indica quién es local, así que home/away quedan a cargo de las odds prematch.
+    """
+
+    captured_at = normalizar_fecha(captured_at) or ahora_utc()
+    event_id = props_data.get('metadata', {}).get('event_id', '')
+    filas = []
+    with conn:
+        _guardar_evento(conn, event_id)
+        for jugador in props_data.get('players_props', []):
+            for mercado in jugador.get('markets', []):
+                for book in mercado.get('books', []):
+                    for out in book.get('outcomes', []):
+                        filas.append((
+                            event_id, jugador['player_id'], jugador.get('player_name'),
+                            mercado['market_name'], out['type'], float(out['total']),
+                            book.get('book_name') or book.get('book_id'), out['odds_decimal'], captured_at,
+                        ))
+        _insertar_en_lotes(conn, SQL_INSERTAR_CUOTA, filas)
+    return len(filas)
+
+
+def guardar_predicciones(conn, event_id, predicciones):
+    """Reemplaza las predicciones del modelo asociadas a un evento de odds."""
+
+    stored_at = ahora_utc()
+    filas = []
+    for pred in predicciones:
+        if not isinstance(pred, dict):
+            continue
+        if pred.get('prediction_type') == 'is_win':
+            mercado, seleccion, linea, player_id = 'moneyline', pred.get('team', ''), None, None
+        else:
+            mercado, seleccion, linea, player_id = (
+                pred['market'], pred['prediction_type'], float(pred['line']), pred['player_id']
+            )
+        filas.append((
+            event_id, pred.get('game_id'), normalizar_fecha(pred.get('event_datetime')), player_id, pred.get('player_name'),
+            pred.get('team'), mercado, seleccion, linea, pred.get('probability', 0), pred.get('confidence'),
+            stored_at,
+        ))
+    with conn:
+        conn.execute('DELETE FROM predicciones WHERE event_id = ?', (event_id,))
+        _insertar_en_lotes(
+            conn,
+            """
+            INSERT INTO predicciones (event_id, game_id, event_datetime, player_id, player_name, team,
+                                      market, selection, line, probability, confidence, stored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            filas,
+        )
+    return len(filas)
+
+
+def _filtro_props(solo_props, alias=''):
+    if solo_props is True:
+        return f' AND {alias}player_id IS NOT NULL'
+    if solo_props is False:
+        return f' AND {alias}player_id IS NULL'
+    return ''
+
+
+def unir_predicciones_cuotas(conn, event_id, agregado='MAX', solo_props=None):
+    """Une predicciones y cuotas del último snapshot de cada mercado del evento.
+
+    ``agregado`` indica cómo combinar las cuotas de los distintos books
+    (``MAX`` para la mejor cuota, ``AVG`` para el promedio). ``solo_props``
+    filtra mercados de jugador (True) o de equipo (False). Como en
+    ``generar_recomendaciones``, el moneyline del equipo local se cruza con
+    ``home`` y cualquier otro equipo con ``away`` (columna ``side``). Los
+    props llevan en ``side`` el lado de su equipo si coincide con el evento.
+    """
+
+    if agregado not in ('MAX', 'AVG'):
+        raise ValueError(f"Agregado no soportado: {agregado}")
+    return conn.execute(
+        f"""
+        SELECT p.event_id, p.game_id, p.player_id, p.player_name, p.team, p.market, p.selection,
+               p.line, p.probability, p.confidence,
+               COALESCE(e.commence_time, p.event_datetime) AS commence_time, e.home_team,
+               CASE WHEN p.player_id IS NULL
+                    THEN CASE WHEN p.team = e.home_team THEN 'home' ELSE 'away' END
+                    WHEN p.team = e.home_team THEN 'home'
+                    WHEN p.team = e.away_team THEN 'away'
+               END AS side,
+               {agregado}(o.price) AS odds
+        FROM predicciones p
+        LEFT JOIN eventos e ON e.event_id = p.event_id
+        JOIN cuotas o
+          ON o.event_id = p.event_id
+         AND o.player_id IS p.player_id
+         AND o.market = p.market
+         AND o.selection = CASE WHEN p.player_id IS NULL
+                                THEN CASE WHEN p.team = e.home_team THEN 'home' ELSE 'away' END
+                                ELSE p.selection END
+         AND o.line IS p.line
+        WHERE p.event_id = ?{_filtro_props(solo_props, 'p.')}
+          AND o.captured_at = (
+              SELECT MAX(s.captured_at) FROM cuotas s
+              WHERE s.event_id = p.event_id AND s.market = p.market
+          )
+        GROUP BY p.id
+        ORDER BY p.id
+        """,
+        (event_id,),
+    ).fetchall()
+
+
+def obtener_evento(conn, event_id):
+    """Metadatos guardados de un evento o None si no existe."""
+    return conn.execute('SELECT * FROM eventos WHERE event_id = ?', (event_id,)).fetchone()
+
+
+def cuotas_ultimo_snapshot(conn, event_id, solo_props=None):
+    """Cuotas del último snapshot de cada mercado del evento."""
+    return conn.execute(
+        f"""
+        SELECT o.* FROM cuotas o
+        WHERE o.event_id = ?{_filtro_props(solo_props, 'o.')}
+          AND o.captured_at = (
+              SELECT MAX(s.captured_at) FROM cuotas s
+              WHERE s.event_id = o.event_id AND s.market = o.market
+          )
+        ORDER BY o.id
+        """,
+        (event_id,),
+    ).fetchall()
+
+
+def predicciones_evento(conn, event_id, solo_props=None):
+    """Predicciones guardadas de un evento en el formato de ``datos_modelo``."""
+
+    predicciones = []
+    filas = conn.execute(
+        f'SELECT * FROM predicciones WHERE event_id = ?{_filtro_props(solo_props)} ORDER BY id',
+        (event_id,),
+    )
+    for fila in filas:
+        pred = {
+            'game_id': fila['game_id'],
+            'event_datetime': fila['event_datetime'],
+            'team': fila['team'],
+            'probability': fila['probability'],
+            'confidence': fila['confidence'],
+        }
+        if fila['player_id'] is None:
+            pred['prediction_type'] = 'is_win'
+        else:
+            pred.update({
+                'player_id': fila['player_id'],
+                'player_name': fila['player_name'],
+                'market': fila['market'],
+                'prediction_type': fila['selection'],
+                'line': fila['line'],
+            })
+        predicciones.append(pred)
+    return predicciones
+
+
+def guardar_recomendaciones(conn, event_id, recomendaciones, solo_props=None):
+    """Reemplaza las recomendaciones de un evento (de jugador, de equipo o ambas)."""
+
+    generated_at = ahora_utc()
+    filas = [
+        (
+            event_id, rec.get('game_id'), normalizar_fecha(rec.get('commence_time')), rec.get('player_id'), rec.get('player_name'), rec.get('team'),
+            rec['market'], rec.get('type') or rec.get('selection'), rec.get('side'), rec.get('line'), rec['odds'],
+            rec['model_prob'], rec.get('implied_prob'), rec['value'], rec.get('confidence'),
+            rec.get('recommendation'), generated_at,
+        )
+        for rec in recomendaciones
+    ]
+    with conn:
+        conn.execute('DELETE FROM recomendaciones WHERE event_id = ?' + _filtro_props(solo_props), (event_id,))
+        _insertar_en_lotes(
+            conn,
+            """
+            INSERT INTO recomendaciones (event_id, game_id, commence_time, player_id, player_name, team, market,
+                                         selection, side, line, odds, model_prob, implied_prob, value,
+                                         confidence, recommendation, generated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            filas,
+        )
+    return len(filas)
+
+
+def recomendaciones_con_valor(conn, desde=None, hasta=None, valor_minimo=0.0, solo_props=None):
+    """Recomendaciones con valor esperado positivo para los eventos entre ``desde`` y ``hasta``.
+
+    ``desde`` y ``hasta`` aceptan cualquier fecha ISO o datetime; sin zona se asume UTC.
+    ``solo_props`` filtra mercados de jugador (True) o de equipo (False).
+    """
+
+    condiciones = ['value > ?']
+    params = [valor_minimo]
+    if desde:
+        condiciones.append('commence_time >= ?')
+        params.append(normalizar_fecha(desde))
+    if hasta:
+        condiciones.append('commence_time <= ?')
+        params.append(normalizar_fecha(hasta))
+    return conn.execute(
+        f"SELECT * FROM recomendaciones WHERE {' AND '.join(condiciones)}{_filtro_props(solo_props)} "
+        "ORDER BY value DESC",
+        params,
+    ).fetchall()
+
+
+def mejor_cuota(conn, player_id, market, selection, line, desde=None):
+    """Mejor cuota disponible para un prop de jugador desde ``desde`` (ISO o datetime, UTC por defecto)."""
+
+    sql = """
+        SELECT book, price, captured_at, event_id
+        FROM cuotas
+        WHERE player_id = ? AND market = ? AND selection = ? AND line = ?
+    """
+    params = [player_id, market, selection, float(line)]
+    if desde:
+        sql += ' AND captured_at >= ?'
+        params.append(normalizar_fecha(desde))
+    sql += ' ORDER BY price DESC, captured_at DESC LIMIT 1'
+    return conn.execute(sql, params).fetchone()
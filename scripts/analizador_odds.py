@@ -2,6 +2,16 @@ import json
 from datetime import datetime
 from statistics import mean
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.almacen_odds import (
+    cuotas_ultimo_snapshot,
+    guardar_recomendaciones,
+    obtener_evento,
+    predicciones_evento,
+    unir_predicciones_cuotas,
+)
 
 def calcular_probabilidad_implícita(odds):
     """Convierte odds decimales a probabilidad implícita"""
@@ -109,6 +119,7 @@ def generar_recomendaciones(predicciones, odds_consolidadas, odds_data):
                         'game_id': prediccion.get('game_id', ''),
                         'market': 'moneyline',
                         'selection': prediccion.get('team', ''),
+                        'side': team_type,
                         'model_prob': prediccion.get('probability', 0),
                         'implied_prob': calcular_probabilidad_implícita(odds_consolidadas['moneyline'][team_type]),
                         'odds': odds_consolidadas['moneyline'][team_type],
@@ -122,6 +133,71 @@ def generar_recomendaciones(predicciones, odds_consolidadas, odds_data):
     
     return recomendaciones
 
+def generar_recomendaciones_almacen(conn, event_id):
+    """Genera las recomendaciones moneyline de un evento consultando el almacén SQLite.
+
+    Usa el promedio de cuotas del último snapshot, igual que ``procesar_odds``,
+    y guarda el resultado en la tabla de recomendaciones.
+    """
+    recomendaciones = []
+    for fila in unir_predicciones_cuotas(conn, event_id, agregado='AVG', solo_props=False):
+        valor = calcular_valor_esperado(fila['probability'], fila['odds'])
+        recomendaciones.append({
+            'game_id': fila['game_id'] or '',
+            'event_id': event_id,
+            'commence_time': fila['commence_time'],
+            'market': fila['market'],
+            'selection': fila['selection'],
+            'side': fila['side'],
+            'model_prob': fila['probability'],
+            'implied_prob': calcular_probabilidad_implícita(fila['odds']),
+            'odds': fila['odds'],
+            'value': valor,
+            'confidence': fila['confidence'] or 0,
+            'recommendation': 'STRONG BET' if valor > 0.15 else ('BET' if valor > 0.05 else 'NO BET')
+        })
+    guardar_recomendaciones(conn, event_id, recomendaciones, solo_props=False)
+    return recomendaciones
+
+def consolidar_odds_almacen(conn, event_id):
+    """Versión de ``procesar_odds`` que lee el último snapshot del almacén SQLite."""
+    consolidated = {
+        'moneyline': {'home': [], 'away': []},
+        'spread': {'home': [], 'away': [], 'points': []},
+        'total': {'over': [], 'under': [], 'points': []}
+    }
+    for fila in cuotas_ultimo_snapshot(conn, event_id, solo_props=False):
+        mercado = fila['market']
+        if mercado == 'total':
+            consolidated['total'][fila['selection']].append(fila['price'])
+            if fila['selection'] == 'over':
+                consolidated['total']['points'].append(fila['line'])
+        elif mercado in ('moneyline', 'spread'):
+            consolidated[mercado][fila['selection']].append(fila['price'])
+            if mercado == 'spread' and fila['selection'] == 'home':
+                consolidated['spread']['points'].append(fila['line'])
+
+    for market in consolidated:
+        for key in consolidated[market]:
+            valores = consolidated[market][key]
+            consolidated[market][key] = mean(valores) if valores else None
+    return consolidated
+
+def analizar_odds_almacen(conn, event_id):
+    """Equivalente de ``analizar_odds`` que consulta el almacén SQLite."""
+    evento = obtener_evento(conn, event_id)
+    odds_data = {
+        'id': event_id,
+        'home_team': evento['home_team'] if evento else '',
+        'away_team': evento['away_team'] if evento else '',
+        'commence_time': evento['commence_time'] if evento else '',
+        'source': 'almacen',
+    }
+    predicciones = predicciones_evento(conn, event_id, solo_props=False)
+    odds_consolidadas = consolidar_odds_almacen(conn, event_id)
+    recomendaciones = generar_recomendaciones_almacen(conn, event_id)
+    return generar_json_integrado(predicciones, odds_data, odds_consolidadas, recomendaciones)
+
 def generar_json_integrado(predicciones, odds_data, odds_consolidadas, recomendaciones):
     return {
         'metadata': {
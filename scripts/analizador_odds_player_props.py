@@ -1,7 +1,17 @@
 import json
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.almacen_odds import (
+    cuotas_ultimo_snapshot,
+    guardar_recomendaciones,
+    obtener_evento,
+    predicciones_evento,
+    unir_predicciones_cuotas,
+)
+
 def calcular_probabilidad_implicita(odds):
     return 1 / odds if odds else None
 
@@ -42,6 +52,7 @@ def analizar_player_props(predicciones, odds_player_props):
 
         valor = calcular_valor_esperado(pred['probability'], odds)
         recomendaciones.append({
+            'game_id': pred.get('game_id', ''),
             'player_id': player_id,
             'player_name': pred['player_name'],
             'team': pred['team'],
@@ -57,6 +68,35 @@ def analizar_player_props(predicciones, odds_player_props):
         })
     return recomendaciones
 
+def analizar_player_props_almacen(conn, event_id):
+    """Analiza los player props de un evento consultando el almacén SQLite.
+
+    Toma la mejor cuota del último snapshot y guarda las recomendaciones.
+    """
+    recomendaciones = []
+    for fila in unir_predicciones_cuotas(conn, event_id, agregado='MAX', solo_props=True):
+        valor = calcular_valor_esperado(fila['probability'], fila['odds'])
+        recomendaciones.append({
+            'game_id': fila['game_id'] or '',
+            'player_id': fila['player_id'],
+            'player_name': fila['player_name'],
+            'team': fila['team'],
+            'side': fila['side'],
+            'event_id': event_id,
+            'commence_time': fila['commence_time'],
+            'market': fila['market'],
+            'type': fila['selection'],
+            'line': fila['line'],
+            'model_prob': fila['probability'],
+            'implied_prob': calcular_probabilidad_implicita(fila['odds']),
+            'odds': fila['odds'],
+            'value': valor,
+            'confidence': fila['confidence'] or 0,
+            'recommendation': 'STRONG BET' if valor > 0.15 else ('BET' if valor > 0.05 else 'NO BET')
+        })
+    guardar_recomendaciones(conn, event_id, recomendaciones, solo_props=True)
+    return recomendaciones
+
 def imprimir_resumen_player_props(analisis):
     print("\n=== RESUMEN DE PLAYER PROPS ===")
     if not analisis['value_analysis']:
@@ -86,12 +126,52 @@ def analizar_player_props_archivos(odds_player_props_path, modelo_player_props_p
 def generar_analisis_player_props(predicciones, odds_props, metadata=None):
     """Genera el análisis de player props y devuelve un diccionario."""
     recomendaciones = analizar_player_props(predicciones, odds_props)
+    return generar_json_player_props(predicciones, odds_props, recomendaciones, metadata)
+
+
+def reconstruir_odds_player_props(filas):
+    """Arma la estructura ``players_props`` a partir de filas de cuotas del almacén."""
+    jugadores = {}
+    for fila in filas:
+        jugador = jugadores.setdefault(fila['player_id'], {
+            'player_id': fila['player_id'],
+            'player_name': fila['player_name'],
+            'markets': {},
+        })
+        mercado = jugador['markets'].setdefault(fila['market'], {'market_name': fila['market'], 'books': {}})
+        book = mercado['books'].setdefault(fila['book'], {'book_name': fila['book'], 'outcomes': []})
+        book['outcomes'].append({'type': fila['selection'], 'odds_decimal': fila['price'], 'total': fila['line']})
+
+    odds_props = []
+    for jugador in jugadores.values():
+        jugador['markets'] = [
+            {'market_name': m['market_name'], 'books': list(m['books'].values())}
+            for m in jugador['markets'].values()
+        ]
+        odds_props.append(jugador)
+    return odds_props
+
+
+def generar_analisis_player_props_almacen(conn, event_id):
+    """Equivalente de ``generar_analisis_player_props`` que consulta el almacén SQLite."""
+    evento = obtener_evento(conn, event_id)
+    metadata = {
+        'event_id': event_id,
+        'teams': [t for t in (evento['home_team'], evento['away_team']) if t] if evento else [],
+    }
+    predicciones = predicciones_evento(conn, event_id, solo_props=True)
+    odds_props = reconstruir_odds_player_props(cuotas_ultimo_snapshot(conn, event_id, solo_props=True))
+    recomendaciones = analizar_player_props_almacen(conn, event_id)
+    return generar_json_player_props(predicciones, odds_props, recomendaciones, metadata, 'almacen+modelo')
+
+
+def generar_json_player_props(predicciones, odds_props, recomendaciones, metadata=None, data_source='API+modelo'):
     return {
         'metadata': {
             'generated_at': datetime.now().isoformat(),
             'event_id': metadata.get('event_id', '') if metadata else '',
             'teams': metadata.get('teams', []) if metadata else [],
-            'data_source': 'API+modelo',
+            'data_source': data_source,
         },
         'model_predictions': predicciones,
         'odds_player_props': odds_props,
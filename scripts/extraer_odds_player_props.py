@@ -2,6 +2,7 @@ import json
 import requests
 from datetime import datetime
 from scripts.config import SPORTRADAR_API_KEY
+from scripts.almacen_odds import guardar_odds_player_props
 
 # Palabras clave de mercados a guardar (amplia si quieres agregar más)
 MERCADOS_CLAVE = [
@@ -77,8 +78,12 @@ def filtrar_player_props(data):
             salida["players_props"].append(jugador)
     return salida
 
-def get_player_props(event_id, api_key=SPORTRADAR_API_KEY):
-    """Obtiene y filtra los player props para un evento."""
+def get_player_props(event_id, api_key=SPORTRADAR_API_KEY, conn=None):
+    """Obtiene y filtra los player props para un evento.
+
+    Si se pasa ``conn`` (ver ``abrir_almacen``) las cuotas se guardan también
+    en el almacén SQLite.
+    """
 
     url = (
         "https://api.sportradar.com/oddscomparison-player-props/trial/v2/en/"
@@ -96,6 +101,8 @@ def get_player_props(event_id, api_key=SPORTRADAR_API_KEY):
 
     # FILTRAR SOLO MERCADOS IMPORTANTES
     filtrado = filtrar_player_props(data)
+    if conn is not None:
+        guardar_odds_player_props(conn, filtrado)
 
     return filtrado
 
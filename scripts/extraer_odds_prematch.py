@@ -1,10 +1,15 @@
 import json
 import requests
 from scripts.config import SPORTRADAR_API_KEY
+from scripts.almacen_odds import guardar_odds_prematch
 
 
-def get_prematch_odds(event_id, api_key=SPORTRADAR_API_KEY):
-    """Obtiene y procesa las odds prematch para el evento indicado."""
+def get_prematch_odds(event_id, api_key=SPORTRADAR_API_KEY, conn=None):
+    """Obtiene y procesa las odds prematch para el evento indicado.
+
+    Si se pasa ``conn`` (ver ``abrir_almacen``) las cuotas se guardan también
+    en el almacén SQLite.
+    """
 
     url = (
         "https://api.sportradar.com/oddscomparison-prematch/trial/v2/en/"
@@ -118,6 +123,9 @@ def get_prematch_odds(event_id, api_key=SPORTRADAR_API_KEY):
         }
     ]
 
+    if conn is not None:
+        guardar_odds_prematch(conn, result)
+
     return result
 
 
@@ -0,0 +1,365 @@
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+# Fracción de Kelly aplicada sobre el óptimo de crecimiento logarítmico
+FRACCION_KELLY = 0.25
+# Límites sobre el bankroll (fracciones de 0 a 1)
+MAX_POR_APUESTA = 0.05
+MAX_POR_EVENTO = 0.15
+MAX_EXPOSICION = 0.50
+# Correlaciones latentes entre props del mismo jugador y carga de cada factor del partido
+RHO_JUGADOR = 0.30
+RHO_PARTIDO = 0.10
+# Escenarios: CELDAS_SIMULACION (escenarios x candidatos) repartidas entre todo el slate,
+# acotadas a [MIN, MAX]_ESCENARIOS
+CELDAS_SIMULACION = 4_000_000
+MIN_ESCENARIOS = 500
+MAX_ESCENARIOS = 64000
+# Semilla fija: el mismo slate produce siempre el mismo plan
+SEMILLA = 0
+MAX_ITERACIONES = 100
+# Parada: mejora relativa del crecimiento por iteración
+TOLERANCIA = 1e-6
+
+
+def _clave_evento(rec):
+    return rec.get('game_id') or rec.get('event_id') or ''
+
+
+def _es_prop(rec):
+    return bool(rec.get('player_id'))
+
+
+def _lado(rec):
+    # El analizador JSON usa 'type'; las filas del almacén guardan el lado en 'selection'
+    return rec.get('type') or rec.get('selection')
+
+
+def _como_dict(rec):
+    """Acepta cualquier Mapping o fila ``sqlite3.Row`` de ``recomendaciones_con_valor``."""
+    if isinstance(rec, Mapping):
+        return dict(rec)
+    if hasattr(rec, 'keys'):
+        return {clave: rec[clave] for clave in rec.keys()}
+    return None
+
+
+def _lados_equipos(recomendaciones):
+    """Mapa (partido, equipo) -> 'home'/'away' a partir de las recomendaciones moneyline."""
+    lados = {}
+    for rec in recomendaciones:
+        if not _es_prop(rec) and rec.get('side') in ('home', 'away'):
+            lados[(_clave_evento(rec), rec.get('selection') or rec.get('team'))] = rec['side']
+    return lados
+
+
+def _construir_estructura(candidatos, lados_equipos=None):
+    """Asigna a cada candidato un latente, un lado y sus factores de correlación.
+
+    Los dos lados de un mismo mercado comparten latente y ganan en colas opuestas.
+    """
+    lados_equipos = lados_equipos or {}
+    eventos, jugadores, latentes = {}, {}, {}
+    latente_evento, latente_jugador, latente_es_prop, latente_signo = [], [], [], []
+    idx_latente, lado_bajo = [], []
+    primera_seleccion = {}
+
+    for rec in candidatos:
+        evento = _clave_evento(rec)
+        if _es_prop(rec):
+            clave = ('prop', evento, rec['player_id'], rec['market'], float(rec['line']))
+            bajo = _lado(rec) == 'over'
+            # Las filas del almacén traen el lado del equipo; el JSON lo toma de los moneyline
+            lado_equipo = rec.get('side') or lados_equipos.get((evento, rec.get('team')))
+            # Los props del local suben con el margen del local; los del visitante, al revés
+            signo = {'home': 1.0, 'away': -1.0}.get(lado_equipo, 0.0)
+        else:
+            clave = ('equipo', evento, rec['market'], rec.get('line'))
+            seleccion = rec.get('selection') or rec.get('team')
+            if rec.get('side') in ('home', 'away'):
+                bajo = rec['side'] == 'home'
+            else:
+                bajo = primera_seleccion.setdefault(clave, seleccion) == seleccion
+            signo = 1.0
+
+        if clave not in latentes:
+            latentes[clave] = len(latentes)
+            latente_evento.append(eventos.setdefault(evento, len(eventos)))
+            if _es_prop(rec):
+                latente_jugador.append(jugadores.setdefault(rec['player_id'], len(jugadores)))
+            else:
+                latente_jugador.append(-1)
+            latente_es_prop.append(_es_prop(rec))
+            latente_signo.append(signo)
+        idx_latente.append(latentes[clave])
+        lado_bajo.append(bajo)
+
+    return {
+        'n_eventos': len(eventos),
+        'n_jugadores': len(jugadores),
+        'latente_evento': np.array(latente_evento, dtype=np.intp),
+        'latente_jugador': np.array(latente_jugador, dtype=np.intp),
+        'latente_es_prop': np.array(latente_es_prop, dtype=bool),
+        'latente_signo': np.array(latente_signo, dtype=float),
+        'idx_latente': np.array(idx_latente, dtype=np.intp),
+        'lado_bajo': np.array(lado_bajo, dtype=bool),
+    }
+
+
+def _normales(rng, filas, n_escenarios):
+    """Normales estándar antitéticas (filas x escenarios): la segunda mitad es la primera con signo opuesto."""
+    mitad = rng.standard_normal((filas, (n_escenarios + 1) // 2), dtype=np.float32)
+    return np.hstack([mitad, -mitad])[:, :n_escenarios]
+
+
+def numero_escenarios(n_candidatos):
+    """Más escenarios para slates pequeños, manteniendo acotado el total de celdas simuladas."""
+    return int(np.clip(CELDAS_SIMULACION // max(n_candidatos, 1), MIN_ESCENARIOS, MAX_ESCENARIOS))
+
+
+def simular_retornos(candidatos, n_escenarios=None, rho_jugador=RHO_JUGADOR,
+                     rho_partido=RHO_PARTIDO, semilla=SEMILLA, lados_equipos=None):
+    """Simula los retornos por unidad apostada (escenarios x candidatos).
+
+    Cada mercado es un latente normal con factores del partido (ritmo y margen) y del jugador.
+    """
+    if not 0 <= rho_partido <= rho_jugador < 1 or 2 * rho_partido >= 1:
+        raise ValueError("Se requiere 0 <= rho_partido <= rho_jugador < 1 y rho_partido < 0.5")
+
+    estructura = _construir_estructura(candidatos, lados_equipos)
+    n_escenarios = n_escenarios or numero_escenarios(len(candidatos))
+    rng = np.random.default_rng(semilla)
+    n_latentes = len(estructura['latente_evento'])
+    es_prop = estructura['latente_es_prop']
+    signo = estructura['latente_signo']
+
+    peso_ritmo = np.where(es_prop, np.sqrt(rho_partido), 0.0)
+    peso_margen = signo * np.sqrt(rho_partido)
+    compartido = peso_ritmo ** 2 + peso_margen ** 2
+    peso_jugador = np.where(es_prop, np.sqrt(np.clip(rho_jugador - compartido, 0.0, None)), 0.0)
+    peso_propio = np.sqrt(1.0 - compartido - peso_jugador ** 2)
+    peso_ritmo, peso_margen, peso_jugador, peso_propio = (
+        w.astype(np.float32)[:, None] for w in (peso_ritmo, peso_margen, peso_jugador, peso_propio)
+    )
+
+    # Se trabaja con latentes en filas (latentes x escenarios) para que cada
+    # latente sea contiguo; el resultado transpuesto queda en orden de columnas.
+    eventos = estructura['latente_evento']
+    z = _normales(rng, n_latentes, n_escenarios)
+    z *= peso_propio
+    ritmo = _normales(rng, estructura['n_eventos'], n_escenarios)
+    margen = _normales(rng, estructura['n_eventos'], n_escenarios)
+    z += ritmo[eventos] * peso_ritmo
+    z += margen[eventos] * peso_margen
+    if es_prop.any():
+        jugador = _normales(rng, estructura['n_jugadores'], n_escenarios)
+        z += jugador[estructura['latente_jugador']] * peso_jugador
+
+    # Cuantiles empíricos: exactamente round(p * N) escenarios ganadores por lado.
+    # El lado bajo gana si z < s[k] y el alto si z > s[N - k - 1], con s ordenado
+    # y extendido con -inf/+inf en los extremos.
+    extremos = np.full((n_latentes, 1), np.inf, dtype=np.float32)
+    ordenados = np.hstack([-extremos, np.sort(z, axis=1), extremos])
+    prob = np.clip([rec['model_prob'] for rec in candidatos], 0.0, 1.0)
+    ganadores = np.rint(prob * n_escenarios).astype(np.intp)
+    idx = estructura['idx_latente']
+    signo = np.where(estructura['lado_bajo'], 1.0, -1.0)
+    umbral = ordenados[idx, np.where(signo > 0, ganadores + 1, n_escenarios - ganadores)] * signo
+
+    # Con el signo, ambos lados ganan cuando signo * z < signo * umbral
+    zc = z[idx]
+    zc *= signo[:, None]
+    gana = zc < umbral[:, None]
+    odds = np.array([rec['odds'] for rec in candidatos], dtype=float)
+    retornos = gana * odds[:, None]
+    retornos -= 1.0
+    return retornos.T
+
+
+def _proyectar(x, limites, iteraciones=40):
+    """Proyección euclídea sobre 0 <= f <= tope_apuesta, sum por evento <= tope_evento y sum <= tope_total."""
+    eventos, n_eventos, tope_apuesta, tope_evento, tope_total = limites
+
+    def por_evento(y):
+        z = np.clip(y, 0.0, tope_apuesta)
+        exceso = np.bincount(eventos, z, n_eventos) > tope_evento
+        if not exceso.any():
+            return z
+        bajo, alto = np.zeros(n_eventos), np.full(n_eventos, max(float(y.max()), 0.0))
+        for _ in range(iteraciones):
+            mu = (bajo + alto) / 2
+            pasa = np.bincount(eventos, np.clip(y - mu[eventos], 0.0, tope_apuesta), n_eventos) > tope_evento
+            bajo, alto = np.where(pasa, mu, bajo), np.where(pasa, alto, mu)
+        return np.clip(y - np.where(exceso, alto, 0.0)[eventos], 0.0, tope_apuesta)
+
+    z = por_evento(x)
+    if z.sum() <= tope_total:
+        return z
+    bajo, alto = 0.0, max(float(x.max()), 0.0)
+    for _ in range(iteraciones):
+        lam = (bajo + alto) / 2
+        if por_evento(x - lam).sum() > tope_total:
+            bajo = lam
+        else:
+            alto = lam
+    return por_evento(x - alto)
+
+
+def _crecimiento(retornos, f, bloques):
+    """Suma por partido de E[log(1 + R_g f_g)] y la riqueza por escenario de cada partido.
+
+    Solo lee las columnas con stake de cada bloque.
+    """
+    total, riquezas = 0.0, []
+    for r, b in zip(retornos, bloques):
+        fb = f[b]
+        activos = np.flatnonzero(fb)
+        riqueza = 1.0 + r[:, activos] @ fb[activos] if activos.size else np.ones(r.shape[0])
+        if riqueza.min() <= 0:
+            return -np.inf, None
+        total += np.log(riqueza).mean()
+        riquezas.append(riqueza)
+    return total, riquezas
+
+
+def optimizar_kelly(retornos, limites, bloques, f_inicial=None, max_iteraciones=MAX_ITERACIONES,
+                    tolerancia=TOLERANCIA):
+    """Maximiza sum_g E[log(1 + R_g f_g)] por gradiente proyectado sobre los ``limites``.
+
+    ``retornos`` tiene una matriz por partido y ``bloques`` los slices de cada partido en ``f``.
+    """
+    # Orden por columnas: cada candidato del bloque queda contiguo en memoria
+    retornos = [np.asfortranarray(r) for r in retornos]
+    n = bloques[-1].stop if bloques else 0
+    f = _proyectar(np.zeros(n) if f_inicial is None else np.asarray(f_inicial, dtype=float), limites)
+    objetivo, riqueza = _crecimiento(retornos, f, bloques)
+    while not np.isfinite(objetivo):
+        f = f / 2
+        objetivo, riqueza = _crecimiento(retornos, f, bloques)
+
+    gradiente, curvatura = np.empty(n), np.empty(n)
+    for r, b, w in zip(retornos, bloques, riqueza):
+        curvatura[b] = w ** -2.0 @ r ** 2 / r.shape[0]
+    paso = 1.0 / max(curvatura.max(), 1e-12)
+
+    for _ in range(max_iteraciones):
+        for r, b, w in zip(retornos, bloques, riqueza):
+            gradiente[b] = (1.0 / w) @ r / r.shape[0]
+
+        for intento in range(30):
+            candidato = _proyectar(f + paso * gradiente, limites)
+            nuevo, nueva_riqueza = _crecimiento(retornos, candidato, bloques)
+            if nuevo > objetivo:
+                break
+            paso *= 0.5
+        else:
+            break
+        if intento == 0:
+            paso *= 2.0
+        ganancia = nuevo - objetivo
+        f, objetivo, riqueza = candidato, nuevo, nueva_riqueza
+        if ganancia < tolerancia * abs(objetivo):
+            break
+    return f, objetivo
+
+
+def generar_plan_stakes(recomendaciones, bankroll, fraccion_kelly=FRACCION_KELLY,
+                        max_por_apuesta=MAX_POR_APUESTA, max_por_evento=MAX_POR_EVENTO,
+                        max_exposicion=MAX_EXPOSICION, rho_jugador=RHO_JUGADOR,
+                        rho_partido=RHO_PARTIDO, n_escenarios=None, semilla=SEMILLA):
+    """Calcula stakes de Kelly fraccionado para un slate con topes por apuesta, evento y exposición.
+
+    Acepta los ``value_analysis`` de ambos analizadores o las filas de ``recomendaciones_con_valor``.
+    """
+    if not 0 < fraccion_kelly <= 1:
+        raise ValueError("Se requiere 0 < fraccion_kelly <= 1")
+    if bankroll <= 0:
+        raise ValueError("El bankroll debe ser positivo")
+    if min(max_por_apuesta, max_por_evento, max_exposicion) <= 0:
+        raise ValueError("Los topes por apuesta, por evento y de exposición deben ser positivos")
+
+    recomendaciones = [rec for rec in map(_como_dict, recomendaciones) if rec]
+    candidatos = [
+        rec for rec in recomendaciones
+        if rec.get('odds') and rec['odds'] > 1 and (rec.get('value') or 0) > 0
+    ]
+    # Candidatos agrupados por partido: cada partido es un bloque contiguo de columnas
+    claves = {}
+    for rec in candidatos:
+        claves.setdefault(_clave_evento(rec), len(claves))
+    candidatos.sort(key=lambda rec: claves[_clave_evento(rec)])
+    eventos = np.array([claves[_clave_evento(rec)] for rec in candidatos], dtype=np.intp)
+    por_partido = np.bincount(eventos, minlength=len(claves))
+    inicios = np.concatenate([[0], np.cumsum(por_partido)])
+    bloques = [slice(inicios[g], inicios[g + 1]) for g in range(len(claves))]
+    n_escenarios = n_escenarios or numero_escenarios(len(candidatos))
+    plan = {
+        'metadata': {
+            'generated_at': datetime.now().isoformat(),
+            'bankroll': bankroll,
+            'fraccion_kelly': fraccion_kelly,
+            'max_por_apuesta': max_por_apuesta,
+            'max_por_evento': max_por_evento,
+            'max_exposicion': max_exposicion,
+            'n_candidatos': len(candidatos),
+            'n_escenarios': n_escenarios,
+        },
+        'stakes': [],
+        'total_stake': 0.0,
+        'exposicion': 0.0,
+        'crecimiento_esperado': 0.0,
+    }
+    if not candidatos:
+        return plan
+
+    # Los partidos son independientes: cada uno se simula con su propia semilla derivada
+    lados_equipos = _lados_equipos(recomendaciones)
+    retornos = [
+        simular_retornos(candidatos[b], n_escenarios, rho_jugador, rho_partido, semilla_partido, lados_equipos)
+        for b, semilla_partido in zip(bloques, np.random.SeedSequence(semilla).spawn(len(bloques)))
+    ]
+    odds = np.array([rec['odds'] for rec in candidatos], dtype=float)
+    prob = np.array([rec['model_prob'] for rec in candidatos], dtype=float)
+    # Los topes se expresan en unidades de Kelly completo: f * fraccion_kelly los respeta
+    limites = (
+        eventos, len(claves), max_por_apuesta / fraccion_kelly,
+        max_por_evento / fraccion_kelly, max_exposicion / fraccion_kelly,
+    )
+    # Punto inicial: Kelly independiente de cada apuesta
+    f_inicial = np.clip((prob * odds - 1.0) / (odds - 1.0), 0.0, None)
+    f_kelly, _ = optimizar_kelly(retornos, limites, bloques, f_inicial)
+    fracciones = f_kelly * fraccion_kelly
+    crecimiento, _ = _crecimiento(retornos, fracciones, bloques)
+
+    for rec, fraccion in zip(candidatos, fracciones):
+        if fraccion <= 0:
+            continue
+        plan['stakes'].append({
+            **rec,
+            'stake_fraction': float(fraccion),
+            'stake': round(float(fraccion) * bankroll, 2),
+        })
+    plan['stakes'].sort(key=lambda x: x['stake'], reverse=True)
+    plan['exposicion'] = float(fracciones.sum())
+    plan['total_stake'] = round(sum(s['stake'] for s in plan['stakes']), 2)
+    plan['crecimiento_esperado'] = float(crecimiento)
+    return plan
+
+
+def imprimir_resumen_stakes(plan):
+    print("\n=== PLAN DE STAKES ===")
+    meta = plan.get('metadata', {})
+    print(f"Bankroll: {meta.get('bankroll', 0):.2f} | Kelly: {meta.get('fraccion_kelly', 0):.2f}")
+    print(f"Total apostado: {plan.get('total_stake', 0):.2f} ({plan.get('exposicion', 0)*100:.1f}% del bankroll)")
+    print(f"Crecimiento log esperado: {plan.get('crecimiento_esperado', 0)*100:.2f}%")
+    if not plan.get('stakes'):
+        print("No hay apuestas con valor positivo.")
+        return
+
+    for s in plan['stakes']:
+        seleccion = s.get('player_name') or s.get('selection', '')
+        detalle = f" {(_lado(s) or '').upper()} {s.get('line')}" if s.get('player_id') else ''
+        print(f"\n{seleccion} | {s.get('market', '')}{detalle}")
+        print(f"Odds: {s['odds']:.2f} | Valor: {s['value']*100:.1f}% | Stake: {s['stake']:.2f}")
@@ -0,0 +1,188 @@
+import copy
+import json
+import os
+
+import pytest
+
+from scripts.almacen_odds import (
+    abrir_almacen,
+    guardar_odds_player_props,
+    guardar_odds_prematch,
+    guardar_predicciones,
+    mejor_cuota,
+    normalizar_fecha,
+    obtener_evento,
+    recomendaciones_con_valor,
+)
+from scripts.analizador_odds import analizar_odds, generar_recomendaciones_almacen
+from scripts.analizador_odds_player_props import analizar_player_props, analizar_player_props_almacen
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cargar_json(*ruta):
+    with open(os.path.join(BASE_DIR, *ruta), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def conn():
+    conexion = abrir_almacen(':memory:')
+    yield conexion
+    conexion.close()
+
+
+@pytest.fixture
+def props():
+    return cargar_json('json', 'odds_extraidas', 'odds_completas_player_props.json')
+
+
+@pytest.fixture
+def modelo_props():
+    return cargar_json('data', 'json', 'datos_modelo_player_props.json')
+
+
+def comparar_recomendaciones(almacen, json_recs, claves):
+    assert len(almacen) == len(json_recs)
+    for rec_almacen, rec_json in zip(almacen, json_recs):
+        for clave in claves:
+            assert rec_almacen[clave] == pytest.approx(rec_json[clave]), clave
+
+
+def test_recomendaciones_moneyline_coinciden_con_json(conn):
+    odds = cargar_json('json', 'odds_extraidas', 'odds_completas_sr_sport_event_56328113.json')
+    modelo = cargar_json('data', 'json', 'datos_modelo.json')
+    event_id = odds[0]['id']
+    guardar_odds_prematch(conn, odds)
+    guardar_predicciones(conn, event_id, modelo['predictions'])
+
+    almacen = generar_recomendaciones_almacen(conn, event_id)
+    json_recs = analizar_odds(modelo, odds)['value_analysis']
+
+    comparar_recomendaciones(almacen, json_recs, ['odds', 'value', 'model_prob', 'implied_prob'])
+    assert [r['selection'] for r in almacen] == [r['selection'] for r in json_recs]
+
+
+def test_moneyline_con_nombre_distinto_al_del_book(conn):
+    odds = cargar_json('json', 'odds_extraidas', 'odds_completas_sr_sport_event_56328113.json')
+    modelo = cargar_json('data', 'json', 'datos_modelo.json')
+    modelo['predictions'][1]['team'] = 'GS Valkyries'
+    guardar_odds_prematch(conn, odds)
+    guardar_predicciones(conn, odds[0]['id'], modelo['predictions'])
+
+    almacen = generar_recomendaciones_almacen(conn, odds[0]['id'])
+    json_recs = analizar_odds(modelo, odds)['value_analysis']
+
+    # Igual que en el JSON, el equipo que no es local se cruza con las cuotas visitantes
+    comparar_recomendaciones(almacen, json_recs, ['odds', 'value'])
+    assert [(r['selection'], r['side']) for r in almacen] == [(r['selection'], r['side']) for r in json_recs]
+    assert almacen[1]['side'] == 'away'
+
+
+def test_recomendaciones_player_props_coinciden_con_json(conn, props, modelo_props):
+    event_id = props['metadata']['event_id']
+    guardar_odds_player_props(conn, props)
+    guardar_predicciones(conn, event_id, modelo_props['predictions'])
+
+    almacen = analizar_player_props_almacen(conn, event_id)
+    json_recs = analizar_player_props(modelo_props['predictions'], props['players_props'])
+
+    comparar_recomendaciones(almacen, json_recs, ['odds', 'value', 'line'])
+    assert [(r['player_id'], r['type']) for r in almacen] == [(r['player_id'], r['type']) for r in json_recs]
+
+
+def test_analisis_usa_ultimo_snapshot(conn, props, modelo_props):
+    event_id = props['metadata']['event_id']
+    guardar_odds_player_props(conn, props, captured_at='2024-07-07T10:00:00Z')
+    nuevas = copy.deepcopy(props)
+    for jugador in nuevas['players_props']:
+        for mercado in jugador['markets']:
+            for book in mercado['books']:
+                for out in book['outcomes']:
+                    out['odds_decimal'] = 1.10
+    guardar_odds_player_props(conn, nuevas, captured_at='2024-07-07T11:00:00Z')
+    guardar_predicciones(conn, event_id, modelo_props['predictions'])
+
+    recomendaciones = analizar_player_props_almacen(conn, event_id)
+
+    assert recomendaciones
+    assert all(r['odds'] == pytest.approx(1.10) for r in recomendaciones)
+
+
+def test_mejor_cuota_respeta_desde(conn, props):
+    guardar_odds_player_props(conn, props, captured_at='2024-07-07T10:00:00Z')
+    nuevas = copy.deepcopy(props)
+    for jugador in nuevas['players_props']:
+        for mercado in jugador['markets']:
+            for book in mercado['books']:
+                for out in book['outcomes']:
+                    out['odds_decimal'] = 1.25
+    guardar_odds_player_props(conn, nuevas, captured_at='2024-07-07T12:00:00+01:00')
+    args = ('sr:player:828039', 'total assists (incl. overtime)', 'over', 3.5)
+
+    historica = mejor_cuota(conn, *args)
+    ultima_hora = mejor_cuota(conn, *args, desde='2024-07-07T10:30:00')
+
+    assert historica['price'] == pytest.approx(1.694)
+    assert historica['captured_at'] == '2024-07-07T10:00:00.000000Z'
+    assert ultima_hora['price'] == pytest.approx(1.25)
+    assert ultima_hora['captured_at'] == '2024-07-07T11:00:00.000000Z'
+
+
+def test_recomendaciones_con_valor_filtra_por_rango(conn, props, modelo_props):
+    event_id = props['metadata']['event_id']
+    guardar_odds_player_props(conn, props)
+    guardar_predicciones(conn, event_id, modelo_props['predictions'])
+    analizar_player_props_almacen(conn, event_id)
+
+    # El partido empieza 2024-07-07T18:00:00Z (14:00 en UTC-4)
+    dentro = recomendaciones_con_valor(conn, desde='2024-07-07T12:00:00-04:00', hasta='2024-07-07T23:59:59Z')
+    fuera = recomendaciones_con_valor(conn, desde='2024-07-07T14:00:01-04:00')
+    fuertes = recomendaciones_con_valor(conn, valor_minimo=0.15, solo_props=True)
+
+    assert [r['player_id'] for r in dentro] == ['sr:player:828039', 'sr:player:827727']
+    assert all(r['value'] > 0 for r in dentro)
+    assert fuera == []
+    assert [r['player_id'] for r in fuertes] == ['sr:player:828039']
+
+
+def test_normalizar_fecha_unifica_formatos():
+    esperado = '2025-07-06T00:00:00.000000Z'
+    assert normalizar_fecha('2025-07-06T00:00:00+00:00') == esperado
+    assert normalizar_fecha('2025-07-06T00:00:00Z') == esperado
+    assert normalizar_fecha('2025-07-05T20:00:00-04:00') == esperado
+    assert normalizar_fecha('2025-07-06T00:00:00') == esperado
+    assert normalizar_fecha(None) is None
+
+
+def test_recomendaciones_con_valor_separa_props_y_equipos(conn, props, modelo_props):
+    odds = cargar_json('json', 'odds_extraidas', 'odds_completas_sr_sport_event_56328113.json')
+    guardar_odds_prematch(conn, odds)
+    guardar_predicciones(conn, odds[0]['id'], cargar_json('data', 'json', 'datos_modelo.json')['predictions'])
+    generar_recomendaciones_almacen(conn, odds[0]['id'])
+    guardar_odds_player_props(conn, props)
+    guardar_predicciones(conn, props['metadata']['event_id'], modelo_props['predictions'])
+    analizar_player_props_almacen(conn, props['metadata']['event_id'])
+
+    todas = recomendaciones_con_valor(conn)
+    jugadores = recomendaciones_con_valor(conn, solo_props=True)
+    equipos = recomendaciones_con_valor(conn, solo_props=False)
+
+    assert jugadores and equipos
+    assert all(r['player_id'] is not None for r in jugadores)
+    assert all(r['player_id'] is None for r in equipos)
+    assert len(todas) == len(jugadores) + len(equipos)
+
+
+def test_props_no_pisan_local_y_visitante(conn, props):
+    event_id = props['metadata']['event_id']
+    prematch = {'id': event_id, 'home_team': 'Washington Commanders', 'away_team': 'Philadelphia Eagles',
+                'commence_time': '2024-07-07T18:00:00Z', 'bookmakers': []}
+
+    guardar_odds_player_props(conn, props)
+    assert obtener_evento(conn, event_id)['home_team'] is None
+    guardar_odds_prematch(conn, prematch)
+    guardar_odds_player_props(conn, props)
+
+    evento = obtener_evento(conn, event_id)
+    assert (evento['home_team'], evento['away_team']) == ('Washington Commanders', 'Philadelphia Eagles')
@@ -0,0 +1,189 @@
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+from scripts.almacen_odds import (
+    abrir_almacen,
+    guardar_odds_player_props,
+    guardar_odds_prematch,
+    guardar_predicciones,
+    recomendaciones_con_valor,
+)
+from scripts.analizador_odds import generar_recomendaciones_almacen
+from scripts.analizador_odds_player_props import analizar_player_props_almacen
+from scripts.gestion_stakes import (
+    CELDAS_SIMULACION,
+    _construir_estructura,
+    _lados_equipos,
+    generar_plan_stakes,
+    simular_retornos,
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIN_TOPES = dict(fraccion_kelly=1.0, max_por_apuesta=1.0, max_por_evento=1.0, max_exposicion=1.0)
+
+
+def prop(game_id, player_id, market, tipo, prob, odds, line=0.5, team='Local'):
+    return {
+        'game_id': game_id, 'player_id': player_id, 'player_name': player_id, 'team': team,
+        'market': market, 'type': tipo, 'line': line, 'model_prob': prob, 'odds': odds,
+        'value': prob * odds - 1,
+    }
+
+
+def moneyline(game_id, team, side, prob, odds):
+    return {
+        'game_id': game_id, 'market': 'moneyline', 'selection': team, 'side': side,
+        'model_prob': prob, 'odds': odds, 'value': prob * odds - 1,
+    }
+
+
+def slate_aleatorio(n_partidos=6, n_jugadores=8, semilla=0):
+    rng = random.Random(semilla)
+    recs = []
+    for g in range(n_partidos):
+        for j in range(n_jugadores):
+            for mercado in ('points', 'assists', 'rebounds'):
+                p = rng.uniform(0.35, 0.65)
+                odds = round(1 / (p * rng.uniform(0.85, 1.0)), 3)
+                recs.append(prop(f'g{g}', f'p{g}_{j}', mercado, 'over', p, odds))
+    return recs
+
+
+@pytest.mark.parametrize('prob, odds', [(0.30, 4.0), (0.55, 2.0), (0.72, 1.53)])
+def test_apuesta_aislada_coincide_con_kelly_analitico(prob, odds):
+    plan = generar_plan_stakes([moneyline('g', 'A', 'home', prob, odds)], 1.0, **SIN_TOPES)
+
+    # Error de la frecuencia simulada <= 1/N, con N = MAX_ESCENARIOS para una sola apuesta
+    assert plan['stakes'][0]['stake_fraction'] == pytest.approx((prob * odds - 1) / (odds - 1), abs=1e-3)
+
+
+def test_lados_opuestos_comparten_latente():
+    recs = [
+        prop('g', 'p1', 'points', 'over', 0.6, 2.0),
+        prop('g', 'p1', 'points', 'under', 0.4, 2.6),
+        moneyline('g', 'Local', 'home', 0.7, 1.6),
+        moneyline('g', 'Visita', 'away', 0.3, 3.6),
+    ]
+    retornos = simular_retornos(recs, 4000, semilla=1, lados_equipos=_lados_equipos(recs))
+    gana = retornos > 0
+
+    assert np.all(gana[:, 0] != gana[:, 1])
+    assert np.all(gana[:, 2] != gana[:, 3])
+    assert gana.mean(axis=0) == pytest.approx([0.6, 0.4, 0.7, 0.3], abs=1 / 4000)
+
+
+def test_moneyline_correlacionado_con_props_de_su_equipo():
+    recs = [
+        moneyline('g', 'Local', 'home', 0.5, 2.1),
+        moneyline('g', 'Visita', 'away', 0.5, 2.1),
+        prop('g', 'local1', 'points', 'over', 0.5, 2.1, team='Local'),
+        prop('g', 'visita1', 'points', 'over', 0.5, 2.1, team='Visita'),
+    ]
+    retornos = simular_retornos(recs, 40000, semilla=2, lados_equipos=_lados_equipos(recs))
+    correlacion = np.corrcoef((retornos > 0).T)
+
+    assert correlacion[0, 2] > 0.03
+    assert correlacion[0, 3] < -0.03
+
+
+def test_topes_por_apuesta_evento_y_exposicion():
+    topes = dict(fraccion_kelly=0.5, max_por_apuesta=0.02, max_por_evento=0.05, max_exposicion=0.2)
+    plan = generar_plan_stakes(slate_aleatorio(), 1000, **topes)
+
+    fracciones = [s['stake_fraction'] for s in plan['stakes']]
+    por_partido = {}
+    for s in plan['stakes']:
+        por_partido[s['game_id']] = por_partido.get(s['game_id'], 0.0) + s['stake_fraction']
+
+    assert max(fracciones) <= topes['max_por_apuesta'] + 1e-12
+    assert max(por_partido.values()) <= topes['max_por_evento'] + 1e-12
+    # El presupuesto recortado se reasigna: la exposición llega al tope cuando este limita
+    assert plan['exposicion'] == pytest.approx(topes['max_exposicion'], abs=1e-9)
+
+
+def test_slate_concentrado_respeta_presupuesto_de_simulacion():
+    plan = generar_plan_stakes(slate_aleatorio(n_partidos=1, n_jugadores=1000), 1000)
+
+    meta = plan['metadata']
+    assert meta['n_candidatos'] == 3000
+    assert meta['n_candidatos'] * meta['n_escenarios'] <= CELDAS_SIMULACION
+    assert plan['exposicion'] <= meta['max_por_evento'] + 1e-12
+
+
+def test_plan_vacio_sin_candidatos_con_valor():
+    negativos = [prop('g', 'p1', 'points', 'over', 0.4, 2.0), moneyline('g', 'A', 'home', 0.5, 1.8)]
+
+    for recomendaciones in ([], negativos):
+        plan = generar_plan_stakes(recomendaciones, 1000)
+        assert plan['stakes'] == []
+        assert plan['metadata']['n_candidatos'] == 0
+        assert plan['total_stake'] == 0.0
+
+
+@pytest.mark.parametrize('parametros', [
+    dict(fraccion_kelly=0), dict(fraccion_kelly=-0.25), dict(fraccion_kelly=1.5),
+    dict(bankroll=0), dict(max_por_apuesta=0), dict(max_por_evento=-0.1), dict(max_exposicion=0),
+])
+def test_parametros_invalidos(parametros):
+    parametros = {'bankroll': 1000, **parametros}
+    with pytest.raises(ValueError):
+        generar_plan_stakes([moneyline('g', 'A', 'home', 0.6, 2.0)], **parametros)
+
+
+def test_plan_determinista_por_defecto():
+    slate = slate_aleatorio(n_partidos=3)
+    assert generar_plan_stakes(slate, 1000)['stakes'] == generar_plan_stakes(slate, 1000)['stakes']
+
+
+def cargar_props():
+    with open(os.path.join(BASE_DIR, 'json', 'odds_extraidas', 'odds_completas_player_props.json')) as f:
+        props = json.load(f)
+    with open(os.path.join(BASE_DIR, 'data', 'json', 'datos_modelo_player_props.json')) as f:
+        modelo = json.load(f)
+    return props, modelo
+
+
+def test_acepta_filas_del_almacen():
+    props, modelo = cargar_props()
+    conn = abrir_almacen(':memory:')
+    event_id = props['metadata']['event_id']
+    guardar_odds_player_props(conn, props)
+    guardar_predicciones(conn, event_id, modelo['predictions'])
+    analizar_player_props_almacen(conn, event_id)
+
+    plan = generar_plan_stakes(recomendaciones_con_valor(conn), 1000)
+    conn.close()
+
+    assert plan['metadata']['n_candidatos'] == 2
+    assert {s['selection'] for s in plan['stakes']} == {'over'}
+    assert {s['game_id'] for s in plan['stakes']} == {'nfl-20240707-PHI-WAS'}
+
+
+def test_props_del_almacen_cargan_el_margen_sin_moneyline_con_valor():
+    props, modelo = cargar_props()
+    event_id = props['metadata']['event_id']
+    local, visitante = 'Washington Commanders', 'Philadelphia Eagles'
+    h2h = {'key': 'h2h', 'outcomes': [{'name': local, 'price': 1.5}, {'name': visitante, 'price': 1.5}]}
+    conn = abrir_almacen(':memory:')
+    guardar_odds_prematch(conn, {'id': event_id, 'home_team': local, 'away_team': visitante,
+                                 'bookmakers': [{'title': 'Book', 'markets': [h2h]}]})
+    guardar_odds_player_props(conn, props)
+    ganadores = [{'prediction_type': 'is_win', 'team': local, 'probability': 0.5},
+                 {'prediction_type': 'is_win', 'team': visitante, 'probability': 0.5}]
+    guardar_predicciones(conn, event_id, ganadores + modelo['predictions'])
+    generar_recomendaciones_almacen(conn, event_id)
+    analizar_player_props_almacen(conn, event_id)
+
+    filas = [dict(fila) for fila in recomendaciones_con_valor(conn)]
+    conn.close()
+    estructura = _construir_estructura(filas, _lados_equipos(filas))
+
+    # Ningún moneyline tiene valor, pero los props siguen cargando el margen con su lado
+    assert filas and all(fila['player_id'] for fila in filas)
+    esperado = [1.0 if fila['team'] == local else -1.0 for fila in filas]
+    assert list(estructura['latente_signo'][estructura['idx_latente']]) == esperado